@@ -2,6 +2,8 @@ import streamlit as st
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 from translation_service import TranslationService
+from translation_memory import TranslationMemory
+from glossary_registry import GlossaryRegistry
 import os
 from dotenv import load_dotenv
 import sqlite3
@@ -10,6 +12,9 @@ import re
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(BASE_DIR, "terms.db")
+TM_DB_PATH = os.path.join(BASE_DIR, "translation_memory.db")
+GLOSSARY_DIR = os.path.join(BASE_DIR, "glossaries")
+GENERAL_DOMAIN = "通用（牛津词典）"
 
 # 加载环境变量
 load_dotenv()
@@ -58,6 +63,24 @@ def preprocess_query(query):
     query = query.lower()
     return ' '.join(query.split())
 
+@st.cache_resource
+def get_glossary_registry():
+    """创建并缓存领域术语库注册表，所有会话共享已打开的术语库"""
+    return GlossaryRegistry(
+        root=GLOSSARY_DIR,
+        memory_budget_mb=float(os.getenv("GLOSSARY_MEMORY_MB", "512"))
+    )
+
+@st.cache_resource
+def get_translation_memory():
+    """加载翻译记忆并缓存"""
+    return TranslationMemory(db_path=TM_DB_PATH)
+
+@st.cache_resource
+def get_translator():
+    """创建并缓存唯一的翻译服务，使延迟统计和熔断状态在请求间共享；API密钥随每次请求传入"""
+    return TranslationService(translation_memory=get_translation_memory())
+
 # 检索函数
 def retrieve_top_k(query, k=5):
     """基于余弦相似度检索Top-K相关术语"""
@@ -92,6 +115,21 @@ def retrieve_top_k(query, k=5):
     
     return results
 
+def retrieve_terms(query, domains, k=5):
+    """在选中的术语库中检索，合并后返回Top-K相关术语"""
+    results = []
+    if GENERAL_DOMAIN in domains:
+        results.extend(retrieve_top_k(query, k=k))
+    glossary_domains = [domain for domain in domains if domain != GENERAL_DOMAIN]
+    if glossary_domains:
+        results.extend(get_glossary_registry().retrieve_top_k(query, glossary_domains, k=k))
+    return sorted(results, key=lambda item: item["similarity"], reverse=True)[:k]
+
+def term_label(i, term):
+    """术语结果的展示标题，领域术语库的结果附带领域名称"""
+    domain = f" [{term['domain']}]" if "domain" in term else ""
+    return f"{i}. {term['term']}{domain} (相似度: {term['similarity']:.4f})"
+
 # 初始化应用状态
 if "terms_loaded" not in st.session_state:
     st.session_state.terms_loaded = False
@@ -107,6 +145,13 @@ api_key = st.sidebar.text_input(
     value=os.getenv("DEEPSEEK_API_KEY", "")
 )
 
+# 术语库选择
+domains = st.sidebar.multiselect(
+    "术语库",
+    options=[GENERAL_DOMAIN] + get_glossary_registry().available_domains(),
+    default=[GENERAL_DOMAIN]
+)
+
 # Top-K参数设置
 k_value = st.sidebar.slider(
     "术语检索数量 (Top-K)",
@@ -153,13 +198,13 @@ if test_button and test_input:
     with st.spinner("正在检索术语..."):
         try:
             # 检索相关术语
-            related_terms = retrieve_top_k(test_input, k=k_value)
+            related_terms = retrieve_terms(test_input, domains, k=k_value)
             
             # 直接显示检索结果，不使用占位符
             if related_terms:
                 st.success(f"找到 {len(related_terms)} 个相关术语")
                 for i, term in enumerate(related_terms, 1):
-                    with st.expander(f"{i}. {term['term']} (相似度: {term['similarity']:.4f})"):
+                    with st.expander(term_label(i, term)):
                         st.write(term['definition'][:200] + "..." if len(term['definition']) > 200 else term['definition'])
             else:
                 st.info("未找到相关术语")
@@ -180,11 +225,11 @@ if translate_button and input_text:
         with st.spinner("正在翻译..."):
             try:
                 # 1. 检索相关术语
-                related_terms = retrieve_top_k(input_text, k=k_value)
+                related_terms = retrieve_terms(input_text, domains, k=k_value)
                 
                 # 2. 执行增强翻译
-                translator = TranslationService(api_key=api_key)
-                translated_text = translator.translate(input_text, related_terms)
+                translator = get_translator()
+                translated_text = translator.translate(input_text, related_terms, api_key=api_key)
                 
                 # 3. 显示翻译结果
                 with col2:
@@ -194,7 +239,7 @@ if translate_button and input_text:
                 if related_terms:
                     st.success(f"找到 {len(related_terms)} 个相关术语")
                     for i, term in enumerate(related_terms, 1):
-                        with st.expander(f"{i}. {term['term']} (相似度: {term['similarity']:.4f})"):
+                        with st.expander(term_label(i, term)):
                             st.write(term['definition'][:200] + "..." if len(term['definition']) > 200 else term['definition'])
                 else:
                     st.info("未找到相关术语")
@@ -202,6 +247,16 @@ if translate_button and input_text:
                 st.error(f"翻译过程中出现错误: {str(e)}")
                 st.exception(e)
 
+# 翻译记忆统计
+tm_stats = get_translation_memory().get_stats()
+st.sidebar.markdown("---")
+st.sidebar.header("翻译记忆")
+st.sidebar.write(
+    f"条目数: {tm_stats['entries']}  \n"
+    f"命中率: {tm_stats['hit_rate']:.1%}（直接复用 {tm_stats['reuse_rate']:.1%}）  \n"
+    f"平均查找耗时: {tm_stats['avg_lookup_ms']:.3f} ms"
+)
+
 # 应用说明
 st.sidebar.markdown("---")
 st.sidebar.header("关于")
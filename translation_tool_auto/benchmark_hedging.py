@@ -0,0 +1,45 @@
+import time
+import numpy as np
+from stub_llm_server import StubLLMServer
+from translation_service import TranslationService
+
+# 对比开启/关闭对冲请求时的尾延迟
+# 模拟上游：常规请求50ms，3%的请求注入2秒延迟
+NUM_REQUESTS = 300
+TEST_TEXT = "Artificial intelligence is transforming the world."
+
+
+def run(server: StubLLMServer, enable_hedging: bool):
+    translator = TranslationService(api_key="stub", base_url=server.url, enable_hedging=enable_hedging)
+    # 预热：先积累足够的延迟样本，与长期运行的服务状态一致
+    for _ in range(translator.hedge_min_samples):
+        translator.translate(TEST_TEXT)
+    translator.stats["hedged"] = translator.stats["hedge_wins"] = 0
+    latencies = []
+    for _ in range(NUM_REQUESTS):
+        start = time.perf_counter()
+        translator.translate(TEST_TEXT)
+        latencies.append(time.perf_counter() - start)
+    translator.executor.shutdown(wait=False)
+    return np.array(latencies) * 1000, translator.stats
+
+
+with StubLLMServer(latency=0.05, slow_ratio=0.03, slow_latency=2.0) as server:
+    for enable_hedging in (False, True):
+        latencies, stats = run(server, enable_hedging)
+        label = "开启对冲" if enable_hedging else "关闭对冲"
+        print(f"\n{label}:")
+        print(f"  P50: {np.percentile(latencies, 50):.1f} ms")
+        print(f"  P95: {np.percentile(latencies, 95):.1f} ms")
+        print(f"  P99: {np.percentile(latencies, 99):.1f} ms")
+        print(f"  对冲请求: {stats['hedged']}，对冲胜出: {stats['hedge_wins']}")
+
+# 熔断测试：上游全部报错时，熔断后应快速失败
+with StubLLMServer(latency=0.5, error_rate=1.0) as server:
+    translator = TranslationService(api_key="stub", base_url=server.url, failure_threshold=3)
+    start = time.perf_counter()
+    for _ in range(20):
+        translator.translate(TEST_TEXT)
+    print(f"\n上游故障时20次请求总耗时: {time.perf_counter() - start:.2f} s")
+    print(f"  熔断器状态: {translator.circuit_breaker.state}，快速失败次数: {translator.stats['short_circuited']}")
+    translator.executor.shutdown(wait=False)
@@ -1,8 +1,9 @@
 import os
 import sqlite3
+import hashlib
 from readmdict import MDX
 import random
-from typing import List, Tuple, Optional
+from typing import List, Tuple, Optional, Iterable, Iterator, Dict
 
 class DataProcessor:
     def __init__(self, mdx_file_path: str = "oxford.mdx", db_path: str = "terms.db"):
@@ -17,25 +18,50 @@ class DataProcessor:
         self.cursor = self.conn.cursor()
     
     def create_table(self):
-        """创建术语表"""
+        """创建术语表和变更日志表"""
         self.cursor.execute('''
             CREATE TABLE IF NOT EXISTS terms (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 word TEXT UNIQUE NOT NULL,
-                definition TEXT NOT NULL
+                definition TEXT NOT NULL,
+                content_hash TEXT
             )
         ''')
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS term_changes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                term_id INTEGER NOT NULL,
+                word TEXT NOT NULL,
+                change_type TEXT NOT NULL,
+                changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # 兼容旧版数据库：补充content_hash列并回填哈希值
+        columns = [row[1] for row in self.cursor.execute("PRAGMA table_info(terms)")]
+        if "content_hash" not in columns:
+            print("正在为已有词条补充内容哈希...")
+            self.cursor.execute("ALTER TABLE terms ADD COLUMN content_hash TEXT")
+            rows = self.cursor.execute("SELECT id, definition FROM terms").fetchall()
+            self.cursor.executemany(
+                "UPDATE terms SET content_hash = ? WHERE id = ?",
+                [(self.content_hash(definition), term_id) for term_id, definition in rows]
+            )
         self.conn.commit()
     
-    def parse_mdx_file(self) -> List[Tuple[str, str]]:
-        """解析MDX文件，提取词条和释义"""
+    def content_hash(self, definition: str) -> str:
+        """计算释义内容的哈希值"""
+        return hashlib.sha1(definition.encode('utf-8')).hexdigest()
+    
+    def iter_mdx_items(self) -> Iterator[Tuple[str, str]]:
+        """逐条解析MDX文件，避免一次性加载全部词条"""
         if not os.path.exists(self.mdx_file_path):
             print(f"MDX文件 {self.mdx_file_path} 不存在，生成模拟数据...")
-            return self.generate_sample_data()
+            yield from self.generate_sample_data()
+            return
         
         print(f"正在解析MDX文件: {self.mdx_file_path}...")
         mdx = MDX(self.mdx_file_path)
-        items = []
         
         for word, definition in mdx.items():
             # 解码数据
@@ -43,8 +69,11 @@ class DataProcessor:
             def_str = definition.decode('utf-8', errors='ignore')
             # 简单清理HTML标签
             def_str = self.clean_html(def_str)
-            items.append((word_str, def_str))
-        
+            yield word_str, def_str
+    
+    def parse_mdx_file(self) -> List[Tuple[str, str]]:
+        """解析MDX文件，提取词条和释义"""
+        items = list(self.iter_mdx_items())
         print(f"解析完成，共提取 {len(items)} 个词条")
         return items
     
@@ -85,14 +114,88 @@ class DataProcessor:
         
         # 批量插入，提高效率
         self.cursor.executemany(
-            "INSERT OR IGNORE INTO terms (word, definition) VALUES (?, ?)",
-            items
+            "INSERT OR IGNORE INTO terms (word, definition, content_hash) VALUES (?, ?, ?)",
+            [(word, definition, self.content_hash(definition)) for word, definition in items]
         )
         
         inserted = self.cursor.rowcount
         self.conn.commit()
         print(f"数据插入完成，成功插入 {inserted} 个词条")
     
+    def sync_data(self, items: Iterable[Tuple[str, str]], batch_size: int = 5000) -> Dict[str, int]:
+        """按内容哈希增量同步词条：新增、更新变化的释义、删除源中已不存在的词条，并记录变更日志"""
+        print("正在增量同步词条...")
+        # 仅加载词条和哈希，不加载释义
+        existing = {word: (term_id, digest) for term_id, word, digest
+                    in self.cursor.execute("SELECT id, word, content_hash FROM terms")}
+        seen = set()
+        inserts, updates = [], []
+        counts = {"added": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+        
+        def flush():
+            if inserts:
+                self.cursor.executemany(
+                    "INSERT INTO terms (word, definition, content_hash) VALUES (?, ?, ?)", inserts)
+                self.cursor.executemany(
+                    "INSERT INTO term_changes (term_id, word, change_type) "
+                    "SELECT id, word, 'added' FROM terms WHERE word = ?",
+                    [(word,) for word, _, _ in inserts])
+            if updates:
+                self.cursor.executemany(
+                    "UPDATE terms SET definition = ?, content_hash = ? WHERE id = ?",
+                    [(definition, digest, term_id) for term_id, _, definition, digest in updates])
+                self.cursor.executemany(
+                    "INSERT INTO term_changes (term_id, word, change_type) VALUES (?, ?, 'updated')",
+                    [(term_id, word) for term_id, word, _, _ in updates])
+            inserts.clear()
+            updates.clear()
+        
+        for word, definition in items:
+            # 与INSERT OR IGNORE保持一致：重复词条只保留第一次出现的释义
+            if word in seen:
+                continue
+            seen.add(word)
+            
+            digest = self.content_hash(definition)
+            if word not in existing:
+                inserts.append((word, definition, digest))
+                counts["added"] += 1
+            elif existing[word][1] != digest:
+                updates.append((existing[word][0], word, definition, digest))
+                counts["updated"] += 1
+            else:
+                counts["unchanged"] += 1
+            
+            if len(inserts) + len(updates) >= batch_size:
+                flush()
+        flush()
+        
+        # 删除源中已不存在的词条；数据源为空时视为解析异常，不执行删除
+        if not seen and existing:
+            print("警告：数据源未产生任何词条，跳过删除步骤")
+        deleted = [(term_id, word) for word, (term_id, _) in existing.items() if seen and word not in seen]
+        if deleted:
+            self.cursor.executemany("DELETE FROM terms WHERE id = ?", [(term_id,) for term_id, _ in deleted])
+            self.cursor.executemany(
+                "INSERT INTO term_changes (term_id, word, change_type) VALUES (?, ?, 'deleted')", deleted)
+        counts["deleted"] = len(deleted)
+        
+        self.conn.commit()
+        print(f"同步完成：新增 {counts['added']}，更新 {counts['updated']}，"
+              f"删除 {counts['deleted']}，未变化 {counts['unchanged']}")
+        return counts
+    
+    def get_changes_since(self, change_id: int = 0) -> List[Tuple[int, int, str, str]]:
+        """获取指定变更编号之后的变更记录 (change_id, term_id, word, change_type)，供下游索引增量更新"""
+        # 下游调用时通常未经过process()，使用独立的只读连接
+        conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+        rows = conn.execute(
+            "SELECT id, term_id, word, change_type FROM term_changes WHERE id > ? ORDER BY id",
+            (change_id,)
+        ).fetchall()
+        conn.close()
+        return rows
+    
     def close_db(self):
         """关闭数据库连接"""
         if self.conn:
@@ -102,8 +205,11 @@ class DataProcessor:
         """完整的数据处理流程"""
         self.connect_db()
         self.create_table()
-        items = self.parse_mdx_file()
-        self.insert_data(items)
+        if os.path.exists(self.mdx_file_path):
+            self.sync_data(self.iter_mdx_items())
+        else:
+            # 模拟数据不是完整的数据源，只插入不同步，避免删除已有词条
+            self.insert_data(self.parse_mdx_file())
         self.close_db()
         print("数据处理流程完成！")
 
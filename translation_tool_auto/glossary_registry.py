@@ -0,0 +1,181 @@
+import heapq
+import os
+import pickle
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict
+from typing import List, Dict
+
+import numpy as np
+from scipy import sparse
+
+from retrieval_engine import RetrievalEngine
+
+# 多领域术语库：每个领域一个目录 glossaries/<domain>/，包含terms.db及构建好的索引文件
+# 索引以内存映射方式打开，注册表按LRU在内存预算内保留常用术语库
+
+INDEX_FILES = ["vectorizer.pkl", "matrix_data.npy", "matrix_indices.npy", "matrix_indptr.npy", "term_ids.npy"]
+MAPPED_FILES = ["matrix_data.npy", "matrix_indices.npy", "matrix_indptr.npy", "term_ids.npy"]
+
+
+def estimate_vectorizer_bytes(vectorizer) -> int:
+    """估算向量器反序列化后在Python堆上的大小：词汇表字典及其键值对象、idf数组、停用词集合"""
+    vocabulary = vectorizer.vocabulary_
+    size = sys.getsizeof(vocabulary)
+    size += sum(sys.getsizeof(term) + sys.getsizeof(idx) for term, idx in vocabulary.items())
+    size += vectorizer.idf_.nbytes
+    stop_words = getattr(vectorizer, "stop_words_", None)
+    if stop_words:
+        size += sys.getsizeof(stop_words) + sum(sys.getsizeof(word) for word in stop_words)
+    return size
+
+
+class Glossary:
+    """单个领域的术语库，术语矩阵以内存映射方式加载，释义按需从数据库读取"""
+    def __init__(self, domain: str, directory: str):
+        self.domain = domain
+        self.directory = directory
+        self.db_path = os.path.join(directory, "terms.db")
+
+        # 复用检索引擎的查询预处理和向量器
+        self.engine = RetrievalEngine(db_path=self.db_path)
+        with open(os.path.join(directory, "vectorizer.pkl"), 'rb') as f:
+            self.engine.vectorizer = pickle.load(f)
+
+        data = np.load(os.path.join(directory, "matrix_data.npy"), mmap_mode='r')
+        indices = np.load(os.path.join(directory, "matrix_indices.npy"), mmap_mode='r')
+        indptr = np.load(os.path.join(directory, "matrix_indptr.npy"), mmap_mode='r')
+        shape = (len(indptr) - 1, len(self.engine.vectorizer.vocabulary_))
+        self.engine.term_matrix = sparse.csr_matrix((data, indices, indptr), shape=shape, copy=False)
+        self.term_ids = np.load(os.path.join(directory, "term_ids.npy"), mmap_mode='r')
+
+        # 内存映射的数组页由操作系统按需换入换出，不计入预算；预算只统计常驻堆上的向量器
+        self.size_bytes = estimate_vectorizer_bytes(self.engine.vectorizer)
+        self.mapped_bytes = sum(os.path.getsize(os.path.join(directory, name)) for name in MAPPED_FILES)
+
+    @staticmethod
+    def build(directory: str):
+        """根据目录中的terms.db构建索引文件"""
+        db_path = os.path.join(directory, "terms.db")
+        conn = sqlite3.connect(db_path)
+        rows = conn.execute("SELECT id, word FROM terms ORDER BY id").fetchall()
+        conn.close()
+
+        engine = RetrievalEngine(db_path=db_path)
+        engine.terms = [word for _, word in rows]
+        engine.build_vectorizer()
+        term_matrix = engine.term_matrix.tocsr()
+
+        with open(os.path.join(directory, "vectorizer.pkl"), 'wb') as f:
+            pickle.dump(engine.vectorizer, f)
+        np.save(os.path.join(directory, "matrix_data.npy"), term_matrix.data.astype(np.float32))
+        np.save(os.path.join(directory, "matrix_indices.npy"), term_matrix.indices)
+        np.save(os.path.join(directory, "matrix_indptr.npy"), term_matrix.indptr)
+        np.save(os.path.join(directory, "term_ids.npy"), np.array([term_id for term_id, _ in rows], dtype=np.int64))
+        print(f"索引构建完成：{directory}（{len(rows)} 个术语）")
+
+    def retrieve_top_k(self, query: str, k: int = 5) -> List[Dict[str, str]]:
+        """检索Top-K相关术语，只读取命中术语的释义"""
+        processed_query = self.engine.preprocess_query(query)
+        query_vector = self.engine.vectorizer.transform([processed_query])
+
+        # TF-IDF向量已做L2归一化，点积即余弦相似度，避免cosine_similarity复制整个矩阵
+        similarities = (self.engine.term_matrix @ query_vector.T).toarray().ravel()
+        k = min(k, len(similarities))
+        if k == 0:
+            return []
+        top_k_indices = np.argpartition(-similarities, k - 1)[:k]
+        top_k_indices = top_k_indices[np.argsort(-similarities[top_k_indices], kind="stable")]
+
+        ids = [int(self.term_ids[idx]) for idx in top_k_indices]
+        conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+        placeholders = ",".join("?" * len(ids))
+        rows = {term_id: (word, definition) for term_id, word, definition in conn.execute(
+            f"SELECT id, word, definition FROM terms WHERE id IN ({placeholders})", ids)}
+        conn.close()
+
+        results = []
+        for idx, term_id in zip(top_k_indices, ids):
+            if term_id not in rows:
+                continue
+            word, definition = rows[term_id]
+            results.append({
+                "term": word,
+                "definition": definition,
+                "similarity": float(similarities[idx]),
+                "domain": self.domain
+            })
+        return results
+
+
+class GlossaryRegistry:
+    """术语库注册表：按需打开各领域术语库，超出内存预算时按LRU淘汰最久未使用的术语库"""
+    def __init__(self, root: str = "glossaries", memory_budget_mb: float = 512):
+        self.root = root
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self.glossaries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def is_built(self, domain: str) -> bool:
+        """领域目录中是否已包含术语库及全部索引文件"""
+        return all(os.path.exists(os.path.join(self.root, domain, name)) for name in ["terms.db"] + INDEX_FILES)
+
+    def available_domains(self) -> List[str]:
+        """列出已构建索引的领域"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root) if self.is_built(name))
+
+    def resident_bytes(self) -> int:
+        """当前已打开术语库的估算堆内存占用（不含内存映射文件）"""
+        return sum(glossary.size_bytes for glossary in self.glossaries.values())
+
+    def get(self, domain: str) -> Glossary:
+        """获取领域术语库，未打开时以内存映射方式加载"""
+        with self._lock:
+            if domain in self.glossaries:
+                self.glossaries.move_to_end(domain)
+                return self.glossaries[domain]
+
+        if not self.is_built(domain):
+            raise ValueError(f"术语库 {domain} 不存在或尚未构建索引")
+
+        # 在锁外打开术语库，避免反序列化向量器时阻塞其他领域的检索
+        print(f"正在打开术语库: {domain}")
+        glossary = Glossary(domain, os.path.join(self.root, domain))
+
+        with self._lock:
+            # 其他线程可能已同时打开了同一术语库
+            if domain in self.glossaries:
+                self.glossaries.move_to_end(domain)
+                return self.glossaries[domain]
+            self.glossaries[domain] = glossary
+
+            # 超出内存预算时淘汰最久未使用的术语库，至少保留当前术语库
+            while self.resident_bytes() > self.memory_budget and len(self.glossaries) > 1:
+                evicted, _ = self.glossaries.popitem(last=False)
+                print(f"内存预算不足，关闭术语库: {evicted}")
+            return glossary
+
+    def retrieve_top_k(self, query: str, domains: List[str], k: int = 5) -> List[Dict[str, str]]:
+        """在多个术语库中检索，合并后返回相似度最高的Top-K结果"""
+        results = []
+        for domain in domains:
+            results.extend(self.get(domain).retrieve_top_k(query, k))
+        return heapq.nlargest(k, results, key=lambda item: item["similarity"])
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="构建领域术语库索引")
+    parser.add_argument("domains", nargs="*", help="要构建的领域，默认构建root下所有包含terms.db的领域")
+    parser.add_argument("--root", default="glossaries", help="术语库根目录")
+    args = parser.parse_args()
+
+    domains = args.domains or sorted(
+        name for name in os.listdir(args.root) if os.path.exists(os.path.join(args.root, name, "terms.db"))
+    )
+    for domain in domains:
+        Glossary.build(os.path.join(args.root, domain))
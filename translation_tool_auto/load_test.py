@@ -0,0 +1,214 @@
+import argparse
+import os
+import random
+import resource
+import subprocess
+import sys
+import threading
+import time
+from typing import List, Dict, Tuple
+
+import numpy as np
+
+from retrieval_engine import RetrievalEngine
+from translation_service import TranslationService
+
+# 翻译流程的压力测试：N个并发虚拟用户执行 检索 -> 生成Prompt -> 翻译
+# 上游LLM使用本地模拟服务，可配置延迟和错误率；模拟服务运行在独立子进程中，
+# 其CPU和内存不计入被测进程
+
+STAGES = ["retrieve", "prompt", "translate", "total"]
+
+# 用于拼接测试文本的句子
+SAMPLE_SENTENCES = [
+    "Artificial intelligence (AI) is a tool that can transform many industries.",
+    "The parties agree that the contract shall terminate upon written notice.",
+    "Patients with chronic heart failure should be monitored for fluid retention.",
+    "The server returned an error because the authentication token had expired.",
+    "Machine learning models require large amounts of labelled training data.",
+    "Payment shall be made within thirty days of receipt of a valid invoice.",
+    "The clinical trial evaluated the efficacy of the new vaccine in adults.",
+    "Cloud computing allows organizations to scale resources on demand.",
+    "Any dispute arising from this agreement shall be settled by arbitration.",
+    "The algorithm sorts the input list in logarithmic time per element.",
+]
+
+
+def generate_text(rng: random.Random) -> str:
+    """生成长度接近真实输入的测试文本：句数服从对数正态分布，中位数约3句"""
+    num_sentences = max(1, min(40, int(rng.lognormvariate(1.1, 0.8))))
+    return " ".join(rng.choice(SAMPLE_SENTENCES) for _ in range(num_sentences))
+
+
+def read_rss_mb() -> float:
+    """读取当前进程的常驻内存（MB）"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError):
+        # 非Linux系统退化为峰值内存
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def cpu_seconds() -> float:
+    """当前进程累计CPU时间（用户态+内核态）"""
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def start_stub_server(args) -> Tuple[subprocess.Popen, str]:
+    """在子进程中启动模拟LLM服务，返回进程及接口地址"""
+    process = subprocess.Popen(
+        [sys.executable, "-u", os.path.join(os.path.dirname(os.path.abspath(__file__)), "stub_llm_server.py"),
+         "--port", "0", "--latency", str(args.latency), "--slow-ratio", str(args.slow_ratio),
+         "--slow-latency", str(args.slow_latency), "--error-rate", str(args.error_rate)],
+        stdout=subprocess.PIPE, text=True
+    )
+    # 服务启动后打印 "模拟LLM服务已启动: <url>"
+    line = process.stdout.readline()
+    if not line:
+        raise RuntimeError("模拟LLM服务启动失败")
+    return process, line.strip().split(": ", 1)[1]
+
+
+def instrument_prompt(translator: TranslationService) -> threading.local:
+    """统计translate内部生成Prompt的耗时，按线程累计"""
+    prompt_time = threading.local()
+    generate = translator.generate_enhanced_prompt
+
+    def timed_generate(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return generate(*args, **kwargs)
+        finally:
+            prompt_time.value = getattr(prompt_time, "value", 0.0) + time.perf_counter() - start
+
+    translator.generate_enhanced_prompt = timed_generate
+    return prompt_time
+
+
+def run_level(engine: RetrievalEngine, translator: TranslationService, prompt_time: threading.local,
+              num_users: int, duration: float, k: int) -> Dict:
+    """以指定并发用户数运行一轮测试"""
+    timings = {stage: [] for stage in STAGES}
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def virtual_user(seed: int):
+        rng = random.Random(seed)
+        while time.perf_counter() < stop_at:
+            text = generate_text(rng)
+            start = time.perf_counter()
+            related_terms = engine.retrieve_top_k(text, k=k)
+            t_retrieve = time.perf_counter()
+            prompt_time.value = 0.0
+            result = translator.translate(text, related_terms)
+            t_translate = time.perf_counter()
+
+            with lock:
+                timings["retrieve"].append(t_retrieve - start)
+                # translate阶段不含其内部生成Prompt的耗时
+                timings["prompt"].append(prompt_time.value)
+                timings["translate"].append(t_translate - t_retrieve - prompt_time.value)
+                timings["total"].append(t_translate - start)
+                if result.startswith("翻译失败"):
+                    errors[0] += 1
+
+    cpu_start = cpu_seconds()
+    wall_start = time.perf_counter()
+    threads = [threading.Thread(target=virtual_user, args=(i,)) for i in range(num_users)]
+    for thread in threads:
+        thread.start()
+
+    # 采样内存峰值
+    peak_rss = read_rss_mb()
+    while any(thread.is_alive() for thread in threads):
+        time.sleep(0.2)
+        peak_rss = max(peak_rss, read_rss_mb())
+    for thread in threads:
+        thread.join()
+
+    wall = time.perf_counter() - wall_start
+    completed = len(timings["total"])
+    return {
+        "users": num_users,
+        "completed": completed,
+        "errors": errors[0],
+        "throughput": completed / wall,
+        "cpu_percent": (cpu_seconds() - cpu_start) / wall * 100,
+        "rss_mb": peak_rss,
+        "latency_ms": {stage: np.percentile(np.array(values) * 1000, [50, 95, 99]) if values else np.zeros(3)
+                       for stage, values in timings.items()},
+    }
+
+
+def find_saturation(results: List[Dict], min_gain: float = 0.1) -> Dict:
+    """吞吐量增幅低于min_gain或P95总延迟翻倍时，认为系统已饱和"""
+    if not results:
+        return None
+    baseline_p95 = results[0]["latency_ms"]["total"][1]
+    for prev, curr in zip(results, results[1:]):
+        gain = (curr["throughput"] - prev["throughput"]) / prev["throughput"] if prev["throughput"] else 0
+        if gain < min_gain or curr["latency_ms"]["total"][1] > 2 * baseline_p95:
+            return prev
+    return None
+
+
+def print_report(results: List[Dict]):
+    """打印测试报告"""
+    print("\n并发用户  完成数  错误数  吞吐量(req/s)  CPU(%)  RSS(MB)")
+    for r in results:
+        print(f"{r['users']:>8}  {r['completed']:>6}  {r['errors']:>6}  {r['throughput']:>13.2f}"
+              f"  {r['cpu_percent']:>6.1f}  {r['rss_mb']:>7.1f}")
+
+    print("\n各阶段延迟 P50 / P95 / P99 (ms)")
+    for r in results:
+        print(f"\n并发用户 {r['users']}:")
+        for stage in STAGES:
+            p50, p95, p99 = r["latency_ms"][stage]
+            print(f"  {stage:<10} {p50:>9.2f} / {p95:>9.2f} / {p99:>9.2f}")
+
+    saturation = find_saturation(results)
+    print()
+    if saturation:
+        print(f"饱和点: 约 {saturation['users']} 个并发用户，吞吐量 {saturation['throughput']:.2f} req/s")
+    else:
+        print("在测试范围内未达到饱和，可增加并发用户数继续测试")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="翻译流程并发压力测试")
+    parser.add_argument("--users", default="1,2,4,8,16,32", help="逐级测试的并发用户数，逗号分隔")
+    parser.add_argument("--duration", type=float, default=10.0, help="每级持续时间（秒）")
+    parser.add_argument("--k", type=int, default=5, help="术语检索数量")
+    parser.add_argument("--db", default="terms.db", help="术语数据库路径")
+    parser.add_argument("--latency", type=float, default=0.5, help="模拟LLM常规延迟（秒）")
+    parser.add_argument("--slow-ratio", type=float, default=0.02, help="模拟LLM慢请求比例")
+    parser.add_argument("--slow-latency", type=float, default=3.0, help="模拟LLM慢请求延迟（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="模拟LLM错误率")
+    args = parser.parse_args()
+
+    levels = [int(n) for n in args.users.split(",") if n.strip()]
+    if not levels:
+        parser.error("--users 至少需要一个并发用户数")
+
+    engine = RetrievalEngine(db_path=args.db)
+    engine.initialize()
+
+    stub_process, stub_url = start_stub_server(args)
+    try:
+        # 与app.py一致，所有用户共享同一个翻译服务
+        translator = TranslationService(api_key="stub", base_url=stub_url)
+        prompt_time = instrument_prompt(translator)
+        results = []
+        for num_users in levels:
+            print(f"正在测试 {num_users} 个并发用户...")
+            results.append(run_level(engine, translator, prompt_time, num_users, args.duration, args.k))
+        translator.executor.shutdown(wait=False)
+    finally:
+        stub_process.terminate()
+        stub_process.wait()
+
+    print_report(results)
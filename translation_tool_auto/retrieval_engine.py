@@ -12,6 +12,8 @@ class RetrievalEngine:
         self.term_matrix = None
         self.terms = []
         self.term_definitions = {}
+        self.term_index = {}
+        self.term_graph = None
     
     def load_terms_from_db(self):
         """从数据库加载术语数据"""
@@ -23,6 +25,7 @@ class RetrievalEngine:
         rows = cursor.fetchall()
         
         for word, definition in rows:
+            self.term_index[word] = len(self.terms)
             self.terms.append(word)
             self.term_definitions[word] = definition
         
@@ -73,6 +76,47 @@ class RetrievalEngine:
         
         return results
     
+    def load_term_graph(self, graph_path: str = "term_neighbors.npz"):
+        """加载离线构建的术语近邻图（见term_graph.py）"""
+        from term_graph import TermGraph, terms_checksum
+        
+        graph = TermGraph.load(graph_path)
+        if graph.checksum != terms_checksum(self.terms):
+            raise ValueError("近邻图与当前术语库不一致，请重新运行term_graph.py构建")
+        self.term_graph = graph
+        print(f"近邻图加载完成：{graph_path}")
+    
+    def get_related_terms(self, term: str, m: int = 5) -> List[Dict[str, str]]:
+        """从近邻图读取与指定术语最相似的m个术语，不计算相似度"""
+        if self.term_graph is None:
+            raise ValueError("近邻图尚未加载，请先调用load_term_graph方法")
+        
+        if term not in self.term_index:
+            return []
+        indices, scores = self.term_graph.neighbors(self.term_index[term], m)
+        return [{
+            "term": self.terms[idx],
+            "definition": self.term_definitions[self.terms[idx]],
+            "similarity": float(score)
+        } for idx, score in zip(indices, scores)]
+    
+    def retrieve_with_expansion(self, query: str, k: int = 5, m: int = 3) -> List[Dict[str, str]]:
+        """检索Top-K术语后用近邻图扩展，近邻得分为 检索相似度 × 近邻相似度"""
+        results = self.retrieve_top_k(query, k)
+        seen = {result["term"] for result in results}
+        
+        expanded = []
+        for result in results:
+            for neighbor in self.get_related_terms(result["term"], m):
+                if neighbor["term"] in seen:
+                    continue
+                seen.add(neighbor["term"])
+                neighbor["similarity"] *= result["similarity"]
+                expanded.append(neighbor)
+        
+        expanded.sort(key=lambda item: item["similarity"], reverse=True)
+        return results + expanded
+    
     def preprocess_query(self, query: str) -> str:
         """预处理查询文本，提高术语匹配准确性"""
         # 移除括号内的内容（如AI）
@@ -92,10 +136,12 @@ class RetrievalEngine:
         self.build_vectorizer()
         print("检索引擎初始化完成！")
     
-    def save_model(self, vectorizer_path: str = "vectorizer.pkl", matrix_path: str = "term_matrix.npz"):
-        """保存向量器和向量矩阵到文件"""
+    def save_model(self, vectorizer_path: str = "vectorizer.pkl", matrix_path: str = "term_matrix.npz",
+                   checksum_path: str = "term_matrix.sha1"):
+        """保存向量器和向量矩阵到文件，同时记录矩阵对应术语列表的校验值"""
         import pickle
         from scipy import sparse
+        from term_graph import terms_checksum
         
         # 保存向量器
         with open(vectorizer_path, 'wb') as f:
@@ -104,18 +150,33 @@ class RetrievalEngine:
         # 保存稀疏矩阵
         sparse.save_npz(matrix_path, self.term_matrix)
         
+        # 矩阵的行与术语列表按位置对应，保存校验值以便加载时发现术语库已变更
+        with open(checksum_path, 'w') as f:
+            f.write(terms_checksum(self.terms))
+        
         print(f"模型保存完成：\n- 向量器: {vectorizer_path}\n- 向量矩阵: {matrix_path}")
     
-    def load_model(self, vectorizer_path: str = "vectorizer.pkl", matrix_path: str = "term_matrix.npz"):
-        """从文件加载向量器和向量矩阵"""
+    def load_model(self, vectorizer_path: str = "vectorizer.pkl", matrix_path: str = "term_matrix.npz",
+                   checksum_path: str = "term_matrix.sha1"):
+        """从文件加载向量器和向量矩阵，术语库与模型文件不一致时重新构建"""
         import pickle
         from scipy import sparse
         import os
+        from term_graph import terms_checksum
+        
+        # 确保术语数据已加载
+        if not self.terms:
+            self.load_terms_from_db()
         
-        if not os.path.exists(vectorizer_path) or not os.path.exists(matrix_path):
-            print("模型文件不存在，将重新构建...")
-            self.initialize()
-            self.save_model()
+        stale = not all(os.path.exists(path) for path in (vectorizer_path, matrix_path, checksum_path))
+        if not stale:
+            # 同步词条后术语位置会移动，旧矩阵的行与新术语列表不再对应
+            with open(checksum_path) as f:
+                stale = f.read().strip() != terms_checksum(self.terms)
+        if stale:
+            print("模型文件不存在或与术语库不一致，将重新构建...")
+            self.build_vectorizer()
+            self.save_model(vectorizer_path, matrix_path, checksum_path)
             return
         
         print("正在从文件加载模型...")
@@ -127,10 +188,6 @@ class RetrievalEngine:
         # 加载向量矩阵
         self.term_matrix = sparse.load_npz(matrix_path)
         
-        # 确保术语数据已加载
-        if not self.terms:
-            self.load_terms_from_db()
-        
         print("模型加载完成！")
 
 if __name__ == "__main__":
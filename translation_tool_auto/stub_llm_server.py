@@ -0,0 +1,117 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _StubHTTPServer(ThreadingHTTPServer):
+    """加大监听队列，避免高并发压测时被默认的5个连接的backlog限制"""
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+class StubLLMServer:
+    """本地模拟LLM服务，兼容chat/completions接口，可注入延迟和错误"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 latency: float = 0.05, slow_ratio: float = 0.0,
+                 slow_latency: float = 2.0, error_rate: float = 0.0):
+        self.host = host
+        self.port = port
+        self.latency = latency            # 常规响应延迟（秒）
+        self.slow_ratio = slow_ratio      # 慢请求比例
+        self.slow_latency = slow_latency  # 慢请求延迟（秒）
+        self.error_rate = error_rate      # 返回500错误的比例
+        self.request_count = 0
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """chat/completions接口地址"""
+        return f"http://{self.host}:{self.port}/v1/chat/completions"
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length)
+                with stub._lock:
+                    stub.request_count += 1
+
+                # 注入延迟
+                delay = stub.slow_latency if random.random() < stub.slow_ratio else stub.latency
+                time.sleep(delay)
+
+                # 注入错误
+                if random.random() < stub.error_rate:
+                    self.send_response(500)
+                    self.end_headers()
+                    return
+
+                try:
+                    prompt = json.loads(body)["messages"][-1]["content"]
+                except (ValueError, KeyError, IndexError):
+                    prompt = ""
+                payload = json.dumps({
+                    "choices": [{"message": {"role": "assistant", "content": f"[stub] {prompt[-50:]}"}}]
+                }).encode("utf-8")
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                # 关闭默认的访问日志
+                pass
+
+        return Handler
+
+    def start(self):
+        """在后台线程中启动服务"""
+        self._server = _StubHTTPServer((self.host, self.port), self._make_handler())
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        print(f"模拟LLM服务已启动: {self.url}", flush=True)
+        return self
+
+    def stop(self):
+        """停止服务"""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="启动本地模拟LLM服务")
+    parser.add_argument("--port", type=int, default=8808)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--slow-ratio", type=float, default=0.0)
+    parser.add_argument("--slow-latency", type=float, default=2.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = StubLLMServer(port=args.port, latency=args.latency, slow_ratio=args.slow_ratio,
+                           slow_latency=args.slow_latency, error_rate=args.error_rate)
+    server.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
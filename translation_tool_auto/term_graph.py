@@ -0,0 +1,122 @@
+import hashlib
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple
+
+import numpy as np
+from scipy import sparse
+
+# 术语近邻图：离线计算每个术语最相似的m个术语，以CSR格式保存
+# 运行时查询相关术语只需读取数组切片，不再计算相似度
+
+_worker_matrix = None
+
+
+def _init_worker(term_matrix):
+    """工作进程初始化：每个进程只接收一次术语矩阵"""
+    global _worker_matrix
+    _worker_matrix = term_matrix
+
+
+def _top_m_block(args) -> Tuple[int, List[np.ndarray], List[np.ndarray]]:
+    """计算一个行块与全部术语的相似度，返回每行的Top-m近邻"""
+    start, end, m = args
+    # TF-IDF向量已做L2归一化，点积即余弦相似度
+    block = (_worker_matrix[start:end] @ _worker_matrix.T).tocsr()
+
+    block_indices, block_scores = [], []
+    for row in range(end - start):
+        lo, hi = block.indptr[row], block.indptr[row + 1]
+        cols = block.indices[lo:hi]
+        scores = block.data[lo:hi]
+        # 排除术语自身和零相似度
+        mask = (cols != start + row) & (scores > 0)
+        cols, scores = cols[mask], scores[mask]
+        if len(scores) > m:
+            top = np.argpartition(-scores, m)[:m]
+            cols, scores = cols[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+        block_indices.append(cols[order].astype(np.int32))
+        block_scores.append(scores[order].astype(np.float32))
+    return start, block_indices, block_scores
+
+
+def terms_checksum(terms: List[str]) -> str:
+    """术语列表的校验值，用于确认近邻图与当前术语顺序一致"""
+    digest = hashlib.sha1()
+    for term in terms:
+        digest.update(term.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def build_neighbor_graph(term_matrix, m: int = 10, block_size: int = 2000,
+                         workers: int = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """分块计算稀疏矩阵乘积，多进程求每个术语的Top-m近邻，返回CSR数组 (indptr, indices, scores)"""
+    term_matrix = sparse.csr_matrix(term_matrix, dtype=np.float32)
+    n_terms = term_matrix.shape[0]
+    tasks = [(start, min(start + block_size, n_terms), m) for start in range(0, n_terms, block_size)]
+
+    rows_indices = [None] * n_terms
+    rows_scores = [None] * n_terms
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(term_matrix,)) as executor:
+        for start, block_indices, block_scores in executor.map(_top_m_block, tasks):
+            rows_indices[start:start + len(block_indices)] = block_indices
+            rows_scores[start:start + len(block_scores)] = block_scores
+            print(f"已完成 {start + len(block_indices)}/{n_terms} 个术语")
+
+    indptr = np.zeros(n_terms + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(row) for row in rows_indices])
+    indices = np.concatenate(rows_indices) if n_terms else np.zeros(0, dtype=np.int32)
+    scores = np.concatenate(rows_scores) if n_terms else np.zeros(0, dtype=np.float32)
+    return indptr, indices, scores
+
+
+class TermGraph:
+    """术语近邻图，按术语下标读取预先计算好的Top-m相关术语"""
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, scores: np.ndarray, checksum: str = ""):
+        self.indptr = indptr
+        self.indices = indices
+        self.scores = scores
+        self.checksum = checksum
+
+    def neighbors(self, idx: int, m: int = None) -> Tuple[np.ndarray, np.ndarray]:
+        """返回术语idx的近邻下标及相似度，按相似度降序排列"""
+        lo, hi = self.indptr[idx], self.indptr[idx + 1]
+        if m is not None:
+            hi = min(hi, lo + m)
+        return self.indices[lo:hi], self.scores[lo:hi]
+
+    def save(self, path: str = "term_neighbors.npz"):
+        """保存近邻图"""
+        np.savez(path, indptr=self.indptr, indices=self.indices, scores=self.scores,
+                 checksum=np.array(self.checksum))
+        print(f"近邻图保存完成: {path}（{self.indices.nbytes + self.scores.nbytes + self.indptr.nbytes} 字节）")
+
+    @classmethod
+    def load(cls, path: str = "term_neighbors.npz") -> "TermGraph":
+        """加载近邻图"""
+        with np.load(path) as data:
+            return cls(data["indptr"], data["indices"], data["scores"], str(data["checksum"]))
+
+
+if __name__ == "__main__":
+    import argparse
+    from retrieval_engine import RetrievalEngine
+
+    parser = argparse.ArgumentParser(description="离线构建术语近邻图")
+    parser.add_argument("--m", type=int, default=10, help="每个术语保留的近邻数量")
+    parser.add_argument("--block-size", type=int, default=2000, help="每次矩阵乘积的行块大小")
+    parser.add_argument("--workers", type=int, default=None, help="工作进程数，默认为CPU核数")
+    parser.add_argument("--output", default="term_neighbors.npz", help="输出文件路径")
+    args = parser.parse_args()
+
+    engine = RetrievalEngine()
+    engine.load_model()
+
+    start = time.perf_counter()
+    indptr, indices, scores = build_neighbor_graph(engine.term_matrix, m=args.m,
+                                                   block_size=args.block_size, workers=args.workers)
+    print(f"近邻图构建完成，耗时 {time.perf_counter() - start:.1f} 秒")
+    TermGraph(indptr, indices, scores, terms_checksum(engine.terms)).save(args.output)
@@ -0,0 +1,249 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import Counter, defaultdict, deque
+from typing import List, Dict, Optional
+
+import numpy as np
+
+# MinHash使用的梅森素数及哈希值上限
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+# 词元：单个汉字或连续的字母、数字，用于判断两段原文除标点和大小写外是否完全一致
+TOKEN_PATTERN = re.compile(r'[\u3400-\u9fff]|[^\W\u3400-\u9fff]+')
+
+def optimal_bands(num_perm: int, threshold: float) -> int:
+    """选择LSH的band数，使相似度阈值两侧的误召回与漏召回概率之和最小"""
+    s = np.linspace(0, 1, 1001)
+    best_bands, best_error = 1, float("inf")
+    for bands in range(1, num_perm + 1):
+        if num_perm % bands:
+            continue
+        # 相似度为s的两个签名至少在一个band中碰撞的概率
+        collide = 1 - (1 - s ** (num_perm // bands)) ** bands
+        error = np.mean(np.where(s < threshold, collide, 1 - collide))
+        if error < best_error:
+            best_bands, best_error = bands, error
+    return best_bands
+
+class TranslationMemory:
+    """翻译记忆库：保存原文、译文及所用术语，基于MinHash/LSH查找近似重复句段"""
+    def __init__(self, db_path: str = "translation_memory.db", num_perm: int = 120, bands: int = None,
+                 shingle_size: int = 4, example_threshold: float = 0.6,
+                 max_candidates: int = 8, max_bucket_scan: int = 256, min_tokens: int = 3):
+        # 默认按example_threshold选择band数（120个哈希对应20个band、每band 6行，碰撞阈值约0.61）
+        bands = bands or optimal_bands(num_perm, example_threshold)
+        if num_perm % bands != 0:
+            raise ValueError("num_perm必须能被bands整除")
+
+        self.db_path = db_path
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.example_threshold = example_threshold  # 超过该相似度作为示例传给模型
+        # 近似重复的样板句会落入同一批桶，只统计每个桶最近的max_bucket_scan个条目，
+        # 并只对碰撞次数最多的max_candidates个候选计算精确相似度
+        self.max_candidates = max_candidates
+        self.max_bucket_scan = max_bucket_scan
+        # 过短的句段（如缩写、编号）脱离上下文无法确定译法，不写入也不查找
+        self.min_tokens = min_tokens
+
+        # 固定随机种子，保证签名在进程重启后保持一致
+        rng = np.random.RandomState(1)
+        self.perm_a = rng.randint(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self.perm_b = rng.randint(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+        self.entries = []                        # [{"source", "translation", "terms"}]
+        self.shingle_sets = []                   # 与entries一一对应的n-gram集合，用于精确校验
+        self.buckets = [defaultdict(list) for _ in range(bands)]
+        self.content_index = defaultdict(list)   # 词元序列 -> 条目下标，直接复用只需查此表
+        self.source_index = {}                   # 原文 -> 条目下标
+        self._lock = threading.Lock()
+
+        self.stats = {"lookups": 0, "reused": 0, "examples": 0, "misses": 0}
+        self.lookup_latencies = deque(maxlen=1000)
+
+        self.create_table()
+        self.load()
+
+    def create_table(self):
+        """创建翻译记忆表"""
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS translation_memory (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                source TEXT UNIQUE NOT NULL,
+                translation TEXT NOT NULL,
+                terms TEXT NOT NULL
+            )
+        ''')
+        conn.commit()
+        conn.close()
+
+    def load(self):
+        """从数据库加载记忆条目并构建LSH索引"""
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute("SELECT source, translation, terms FROM translation_memory ORDER BY id").fetchall()
+        conn.close()
+
+        for source, translation, terms in rows:
+            self._index(source, translation, json.loads(terms))
+        print(f"翻译记忆加载完成，共 {len(self.entries)} 条")
+
+    def normalize(self, text: str) -> str:
+        """规范化文本：小写并合并空白"""
+        return ' '.join(text.lower().split())
+
+    def tokens(self, text: str) -> List[str]:
+        """切分词元：汉字逐字，字母和数字按连续片段，忽略标点并转为小写"""
+        return TOKEN_PATTERN.findall(text.lower())
+    
+    def content_key(self, text: str) -> str:
+        """原文的词元序列，忽略标点和大小写；数字或用词不同的原文键值不同"""
+        return ' '.join(self.tokens(text))
+    
+    def shingles(self, text: str) -> set:
+        """将文本切分为字符n-gram集合，同时适用于中英文"""
+        text = re.sub(r'\s+', ' ', self.normalize(text))
+        n = self.shingle_size
+        if len(text) <= n:
+            return {text}
+        return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+    def minhash(self, shingles: set) -> np.ndarray:
+        """计算n-gram集合的MinHash签名"""
+        hashes = np.array([zlib.crc32(s.encode('utf-8')) for s in shingles], dtype=np.uint64)
+        # (a * x + b) mod p，按行取最小值
+        values = (np.outer(hashes, self.perm_a) + self.perm_b) % _MERSENNE_PRIME
+        return (values & _MAX_HASH).min(axis=0)
+
+    def _band_keys(self, signature: np.ndarray):
+        """将签名切分为若干band，每个band作为一个LSH桶键"""
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def _index(self, source: str, translation: str, terms: List[str]):
+        """将条目加入内存索引"""
+        shingles = self.shingles(source)
+        signature = self.minhash(shingles)
+        with self._lock:
+            idx = len(self.entries)
+            self.entries.append({"source": source, "translation": translation, "terms": terms})
+            self.shingle_sets.append(shingles)
+            self.content_index[self.content_key(source)].append(idx)
+            self.source_index[source] = idx
+            for band, key in self._band_keys(signature):
+                self.buckets[band][key].append(idx)
+
+    def lookup(self, text: str, terms: List[str] = None) -> Optional[Dict]:
+        """查找最相似的记忆条目，低于example_threshold时返回None；
+        reusable表示原文仅标点或大小写不同且术语集合与terms一致，其余命中只作为示例"""
+        if len(self.tokens(text)) < self.min_tokens:
+            return None
+        start = time.perf_counter()
+        shingles = self.shingles(text)
+        signature = self.minhash(shingles)
+        content = self.content_key(text)
+        wanted = None if terms is None else sorted(terms)
+
+        # 锁内只取出桶和词元序列相同的条目；条目和桶只追加，计数与校验在锁外进行
+        with self._lock:
+            same_content = list(self.content_index.get(content, ()))
+            buckets = [self.buckets[band].get(key, []) for band, key in self._band_keys(signature)]
+
+        # 按碰撞的band数排序候选，碰撞越多相似度越高，只精确校验排在最前的少数候选
+        collisions = Counter()
+        for bucket in buckets:
+            collisions.update(bucket[-self.max_bucket_scan:])
+        candidates = {idx for idx, _ in collisions.most_common(self.max_candidates)}
+        candidates.update(same_content)
+
+        best, best_key = None, (False, 0.0)
+        for idx in candidates:
+            entry = self.entries[idx]
+            candidate = self.shingle_sets[idx]
+            sim = len(shingles & candidate) / len(shingles | candidate)
+            # n-gram相似度无法区分 10 mg 与 100 mg，直接复用要求词元序列完全一致
+            reusable = idx in same_content and (wanted is None or sorted(entry["terms"]) == wanted)
+            if (reusable, sim) > best_key:
+                best, best_key = entry, (reusable, sim)
+
+        reusable, best_sim = best_key
+        with self._lock:
+            self.lookup_latencies.append(time.perf_counter() - start)
+            self.stats["lookups"] += 1
+            if best is None or (not reusable and best_sim < self.example_threshold):
+                self.stats["misses"] += 1
+                return None
+            if reusable:
+                self.stats["reused"] += 1
+            else:
+                self.stats["examples"] += 1
+        return dict(best, similarity=best_sim, reusable=reusable)
+
+    def add(self, source: str, translation: str, terms: List[str]):
+        """保存新的翻译结果，原文已存在时更新译文；过短的句段不保存"""
+        if len(self.tokens(source)) < self.min_tokens:
+            return
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO translation_memory (source, translation, terms) VALUES (?, ?, ?)",
+            (source, translation, json.dumps(terms, ensure_ascii=False))
+        )
+        inserted = cursor.rowcount
+        if not inserted:
+            conn.execute(
+                "UPDATE translation_memory SET translation = ?, terms = ? WHERE source = ?",
+                (translation, json.dumps(terms, ensure_ascii=False), source)
+            )
+        conn.commit()
+        conn.close()
+
+        if inserted:
+            self._index(source, translation, terms)
+        else:
+            with self._lock:
+                # 并发写入同一原文时，插入方可能尚未建立索引
+                idx = self.source_index.get(source)
+                if idx is not None:
+                    self.entries[idx]["translation"] = translation
+                    self.entries[idx]["terms"] = terms
+
+    def get_stats(self) -> Dict[str, float]:
+        """返回命中率和查找延迟统计"""
+        lookups = self.stats["lookups"]
+        latencies = np.array(self.lookup_latencies) * 1000
+        return {
+            "entries": len(self.entries),
+            "lookups": lookups,
+            "reused": self.stats["reused"],
+            "examples": self.stats["examples"],
+            "misses": self.stats["misses"],
+            "hit_rate": (self.stats["reused"] + self.stats["examples"]) / lookups if lookups else 0.0,
+            "reuse_rate": self.stats["reused"] / lookups if lookups else 0.0,
+            "avg_lookup_ms": float(latencies.mean()) if len(latencies) else 0.0,
+            "p99_lookup_ms": float(np.percentile(latencies, 99)) if len(latencies) else 0.0
+        }
+
+if __name__ == "__main__":
+    import os
+    import tempfile
+
+    # 测试翻译记忆
+    memory = TranslationMemory(db_path=os.path.join(tempfile.mkdtemp(), "translation_memory.db"))
+    memory.add("Artificial intelligence is transforming the world.", "人工智能正在改变世界。",
+               ["artificial intelligence", "transform"])
+
+    for query in ["Artificial intelligence is transforming the world!",
+                  "Artificial intelligence is transforming the industry.",
+                  "The weather is nice today."]:
+        match = memory.lookup(query)
+        if match:
+            print(f"{query} -> {match['translation']} (相似度: {match['similarity']:.2f})")
+        else:
+            print(f"{query} -> 未命中")
+    print(memory.get_stats())
@@ -1,24 +1,141 @@
 import os
+import re
+import time
+import threading
 import requests
-from typing import List, Dict, Optional
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Dict, Optional, Tuple
 from dotenv import load_dotenv
+from translation_memory import TOKEN_PATTERN
 
 # 加载环境变量
 load_dotenv()
 
+# 句段切分：以句末标点或换行结尾，同时保留其后的空白以便拼接译文
+SENTENCE_PATTERN = re.compile(r'(\S.*?(?:[.!?。！？]+(?=\s|$)|[。！？]+|(?=\n)|$))(\s*)', re.S)
+# 常见缩写及单字母缩写（如姓名首字母），其后的句点不视为句末
+ABBREVIATION_PATTERN = re.compile(
+    r'(?:^|[\s(])(?:mr|mrs|ms|dr|prof|sr|jr|st|mt|no|nos|fig|figs|vol|pp|vs|etc|inc|ltd|co|corp|dept|approx|'
+    r'jan|feb|mar|apr|jun|jul|aug|sep|sept|oct|nov|dec|e\.g|i\.e|a\.m|p\.m|u\.s|[a-z])\.$', re.I)
+# 编号译文解析：每段以 [n] 开头
+NUMBERED_PATTERN = re.compile(r'^\s*\[(\d+)\]\s*(.*?)(?=^\s*\[\d+\]|\Z)', re.S | re.M)
+NUMBER_MARKER = re.compile(r'^\s*\[\d+\]\s*', re.M)
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """熔断器打开时的快速失败"""
+
+class LatencyTracker:
+    """滚动窗口内的请求延迟统计"""
+    def __init__(self, window_size: int = 200):
+        self.samples = deque(maxlen=window_size)
+        self._lock = threading.Lock()
+    
+    def record(self, latency: float):
+        """记录一次请求耗时（秒）"""
+        with self._lock:
+            self.samples.append(latency)
+    
+    def percentile(self, p: float) -> Optional[float]:
+        """返回窗口内第p百分位的延迟，无样本时返回None"""
+        with self._lock:
+            if not self.samples:
+                return None
+            ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(len(ordered) * p / 100))
+        return ordered[index]
+    
+    def __len__(self):
+        return len(self.samples)
+
+class CircuitBreaker:
+    """熔断器：连续失败达到阈值后快速失败，冷却期过后放行单个探测请求"""
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.failure_count = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+    
+    def allow_request(self) -> bool:
+        """判断当前是否允许发出请求"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            # 冷却期结束进入半开状态，仅放行一个探测请求；
+            # 探测请求超过冷却期仍未报告结果时，再放行一个新的探测请求
+            if time.monotonic() - self.opened_at >= self.recovery_timeout:
+                self.state = self.HALF_OPEN
+                self.opened_at = time.monotonic()
+                return True
+            return False
+    
+    def record_success(self):
+        """请求成功，关闭熔断器"""
+        with self._lock:
+            self.state = self.CLOSED
+            self.failure_count = 0
+    
+    def record_failure(self):
+        """请求失败，达到阈值或探测失败时打开熔断器"""
+        with self._lock:
+            self.failure_count += 1
+            if self.state == self.HALF_OPEN or self.failure_count >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
 class TranslationService:
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None,
+                 timeout: float = 30, enable_hedging: bool = True,
+                 hedge_percentile: float = 95, hedge_min_samples: int = 20,
+                 failure_threshold: int = 5, recovery_timeout: float = 30.0,
+                 translation_memory=None, max_workers: int = 32, max_hedge_ratio: float = 0.1):
+        # 默认密钥；多用户共享同一服务时可在translate中按请求传入各自的密钥
         self.api_key = api_key or os.getenv("DEEPSEEK_API_KEY")
-        if not self.api_key:
-            raise ValueError("DeepSeek API密钥未提供，请设置DEEPSEEK_API_KEY环境变量")
         
-        self.base_url = "https://api.deepseek.com/v1/chat/completions"
-        self.headers = {
-            "Authorization": f"Bearer {self.api_key}",
+        self.base_url = base_url or "https://api.deepseek.com/v1/chat/completions"
+        self.timeout = timeout
+        
+        # 对冲请求：首个请求耗时超过滚动P95延迟时，再发一个相同请求，取先返回者
+        self.enable_hedging = enable_hedging
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.max_hedge_ratio = max_hedge_ratio  # 对冲请求占总请求的比例上限，防止过载时放大负载
+        self.latency_tracker = LatencyTracker()
+        # 翻译服务在所有会话间共享，线程池大小即上游并发请求上限
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        
+        # 熔断器：上游持续出错时直接返回降级结果，不再等待超时
+        self.circuit_breaker = CircuitBreaker(failure_threshold, recovery_timeout)
+        
+        # 翻译记忆：近似重复的原文直接复用译文或作为示例
+        self.translation_memory = translation_memory
+        
+        self.stats = {"requests": 0, "hedged": 0, "hedge_wins": 0, "short_circuited": 0}
+        self._stats_lock = threading.Lock()
+    
+    def _count(self, name: str):
+        """并发会话共享统计计数，加锁递增"""
+        with self._stats_lock:
+            self.stats[name] += 1
+    
+    def build_headers(self, api_key: Optional[str] = None) -> Dict[str, str]:
+        """构建请求头，未传入密钥时使用默认密钥"""
+        api_key = api_key or self.api_key
+        if not api_key:
+            raise ValueError("DeepSeek API密钥未提供，请设置DEEPSEEK_API_KEY环境变量")
+        return {
+            "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json"
         }
     
-    def generate_enhanced_prompt(self, text: str, related_terms: List[Dict[str, str]]) -> str:
+    def generate_enhanced_prompt(self, text: str, related_terms: List[Dict[str, str]],
+                                 examples: List[Dict[str, str]] = None, numbered: bool = False) -> str:
         """生成增强翻译Prompt"""
         # 构建术语参考信息
         terms_info = ""
@@ -27,6 +144,15 @@ class TranslationService:
             for term in related_terms:
                 terms_info += f"\n- {term['term']}: {term['definition'][:100]}..."
         
+        # 构建翻译记忆示例
+        if examples:
+            terms_info += "\n\n相似句段的历史译文（请保持用词一致）："
+            for example in examples:
+                terms_info += f"\n原文：{example['source']}\n译文：{example['translation']}"
+        
+        # 按编号分段翻译时要求保留编号，便于逐句拆分译文
+        numbered_rule = "\n5. 待翻译文本按[编号]分段，请逐段翻译，每段译文单独一行并以相同的[编号]开头" if numbered else ""
+        
         # 设计增强翻译Prompt模板
         prompt = f"""你是一位专业的翻译助手，擅长将文本准确、流畅地翻译成目标语言。
 
@@ -34,7 +160,7 @@ class TranslationService:
 1. 保持原文的意思和风格
 2. 注意专业术语的准确性
 3. 翻译结果要自然流畅
-4. 如果有相关术语参考，请结合参考信息进行翻译
+4. 如果有相关术语参考，请结合参考信息进行翻译{numbered_rule}
 
 {terms_info}
 
@@ -45,14 +171,85 @@ class TranslationService:
         
         return prompt
     
-    def translate(self, text: str, related_terms: List[Dict[str, str]] = None) -> str:
-        """执行增强翻译"""
+    def translate(self, text: str, related_terms: List[Dict[str, str]] = None, api_key: Optional[str] = None) -> str:
+        """执行增强翻译，api_key为空时使用创建服务时的密钥"""
         if related_terms is None:
             related_terms = []
+        headers = self.build_headers(api_key)
+        
+        try:
+            if self.translation_memory is not None:
+                return self._translate_with_memory(text, related_terms, headers)
+            return self._complete(self.generate_enhanced_prompt(text, related_terms), headers)
+        except requests.exceptions.RequestException as e:
+            print(f"API调用失败: {str(e)}")
+            # 返回原始文本作为降级方案
+            return f"翻译失败: {str(e)}\n\n原始文本: {text}"
+    
+    def split_sentences(self, text: str) -> List[Tuple[str, str]]:
+        """将文本切分为句段，返回 (句段, 句段后的空白) 列表；缩写后及只有一个词的片段不切分"""
+        segments = []
+        for segment, whitespace in (match.groups() for match in SENTENCE_PATTERN.finditer(text)):
+            if segments and "\n" not in segments[-1][1]:
+                previous, gap = segments[-1]
+                # 如 "Dr. Smith paid $3.50 on Jan. 5." 应保持为一个句段
+                # 以缩写结尾的单词片段（如 "Dr."）并入下一句段，而不是上一句段
+                if (ABBREVIATION_PATTERN.search(previous) or len(TOKEN_PATTERN.findall(previous)) <= 1
+                        or (len(TOKEN_PATTERN.findall(segment)) <= 1 and not ABBREVIATION_PATTERN.search(segment))):
+                    segments[-1] = (previous + gap + segment, whitespace)
+                    continue
+            segments.append((segment, whitespace))
+        return segments
+    
+    def segment_terms(self, segment: str, related_terms: List[Dict[str, str]]) -> List[str]:
+        """句段中实际出现的术语（带所属领域），用于判断历史译文能否直接复用"""
+        lowered = segment.lower()
+        return sorted({f"{term.get('domain', '')}:{term['term']}" for term in related_terms
+                       if term['term'].lower() in lowered})
+    
+    def _translate_with_memory(self, text: str, related_terms: List[Dict[str, str]], headers: Dict[str, str]) -> str:
+        """逐句查询翻译记忆：可复用的句段直接使用历史译文，其余句段合并为一次请求翻译"""
+        segments = self.split_sentences(text)
+        if not segments:
+            return self._complete(self.generate_enhanced_prompt(text, related_terms), headers)
+        
+        translations = [None] * len(segments)
+        misses, examples = [], {}
+        for i, (segment, _) in enumerate(segments):
+            terms = self.segment_terms(segment, related_terms)
+            match = self.translation_memory.lookup(segment, terms)
+            if match and match["reusable"]:
+                translations[i] = match["translation"]
+                continue
+            misses.append((i, terms))
+            if match:
+                examples[match["source"]] = match
+        examples = sorted(examples.values(), key=lambda item: item["similarity"], reverse=True)[:3]
         
-        # 生成增强Prompt
-        prompt = self.generate_enhanced_prompt(text, related_terms)
+        if len(misses) == 1:
+            i, terms = misses[0]
+            translations[i] = self._complete(self.generate_enhanced_prompt(segments[i][0], related_terms, examples), headers)
+            self.translation_memory.add(segments[i][0], translations[i], terms)
+        elif misses:
+            numbered_text = "\n".join(f"[{n}] {segments[i][0]}" for n, (i, _) in enumerate(misses, 1))
+            output = self._complete(self.generate_enhanced_prompt(numbered_text, related_terms, examples, numbered=True),
+                                    headers)
+            parsed = {int(n): part.strip() for n, part in NUMBERED_PATTERN.findall(output)}
+            if sorted(parsed) == list(range(1, len(misses) + 1)):
+                for n, (i, terms) in enumerate(misses, 1):
+                    translations[i] = parsed[n]
+                    self.translation_memory.add(segments[i][0], parsed[n], terms)
+            else:
+                # 模型未按编号输出，无法逐句拆分：直接使用本次译文（去掉编号）放在首个未命中句段处，不写入记忆
+                translations[misses[0][0]] = NUMBER_MARKER.sub("", output).strip()
+                for i, _ in misses[1:]:
+                    translations[i] = ""
         
+        return "".join(translation + whitespace for translation, (_, whitespace) in zip(translations, segments)
+                       if translation).strip()
+    
+    def _complete(self, prompt: str, headers: Dict[str, str]) -> str:
+        """发送Prompt并返回模型输出，受熔断器保护"""
         # 构建API请求体
         payload = {
             "model": "deepseek-chat",
@@ -63,20 +260,77 @@ class TranslationService:
             "max_tokens": 1000
         }
         
+        # 熔断打开时快速失败
+        if not self.circuit_breaker.allow_request():
+            self._count("short_circuited")
+            raise CircuitOpenError("翻译服务暂时不可用，请稍后重试")
+        
+        self._count("requests")
         try:
-            # 发送API请求
-            response = requests.post(self.base_url, headers=self.headers, json=payload, timeout=30)
-            response.raise_for_status()  # 检查请求是否成功
-            
-            # 解析响应
-            result = response.json()
-            translated_text = result["choices"][0]["message"]["content"]
-            
-            return translated_text
-        except requests.exceptions.RequestException as e:
-            print(f"API调用失败: {str(e)}")
-            # 返回原始文本作为降级方案
-            return f"翻译失败: {str(e)}\n\n原始文本: {text}"
+            # 发送API请求（必要时发送对冲请求）
+            translated_text = self._post_with_hedge(payload, headers)
+        except Exception:
+            # 响应格式异常等错误同样计入失败，避免熔断器停留在半开状态
+            self.circuit_breaker.record_failure()
+            raise
+        self.circuit_breaker.record_success()
+        return translated_text
+    
+    def _send_request(self, payload: Dict, headers: Dict[str, str], started: threading.Event = None) -> str:
+        """发送单个API请求并解析翻译结果"""
+        if started is not None:
+            started.set()
+        start = time.perf_counter()
+        response = requests.post(self.base_url, headers=headers, json=payload, timeout=self.timeout)
+        response.raise_for_status()  # 检查请求是否成功
+        
+        # 解析响应
+        result = response.json()
+        translated_text = result["choices"][0]["message"]["content"]
+        
+        self.latency_tracker.record(time.perf_counter() - start)
+        return translated_text
+    
+    def _post_with_hedge(self, payload: Dict, headers: Dict[str, str]) -> str:
+        """首个请求超过滚动延迟阈值仍未返回时发送对冲请求，取最先成功的结果"""
+        started = threading.Event()
+        primary = self.executor.submit(self._send_request, payload, headers, started)
+        
+        hedge_delay = None
+        if self.enable_hedging and len(self.latency_tracker) >= self.hedge_min_samples:
+            hedge_delay = self.latency_tracker.percentile(self.hedge_percentile)
+        if hedge_delay is None:
+            return primary.result()
+        
+        # 从请求真正开始执行时计时，线程池排队时间不计入对冲等待
+        started.wait()
+        done, _ = wait([primary], timeout=hedge_delay)
+        if done:
+            return primary.result()
+        # 检查对冲预算与计数在同一把锁内完成，避免并发会话同时越过预算
+        with self._stats_lock:
+            over_budget = self.stats["hedged"] >= self.max_hedge_ratio * self.stats["requests"]
+            if not over_budget:
+                self.stats["hedged"] += 1
+        if over_budget:
+            return primary.result()
+        
+        # 首个请求过慢，发送对冲请求
+        hedge = self.executor.submit(self._send_request, payload, headers)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    translated_text = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                if future is hedge:
+                    self._count("hedge_wins")
+                return translated_text
+        raise error
 
 if __name__ == "__main__":
     # 测试翻译服务